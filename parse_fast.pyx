@@ -0,0 +1,46 @@
+# cython: language_level=3
+"""
+parse_topics.py 中 topic 字段提取循环 (_extract_topics) 的 Cython 版本。
+
+编译: cythonize -3 -i parse_fast.pyx
+未编译时 parse_topics.py 自动使用纯 Python 实现，两者的结果完全一致。
+"""
+
+
+cdef inline object _owner_name(dict data):
+    """
+    取出问题/回答中 owner 的名字；owner 缺失或为 null 时返回 None。
+    """
+    cdef object owner = data.get('owner')
+    if not owner:
+        return None
+    return owner.get('name')
+
+
+def parse_topics(list topics):
+    """
+    从 'resp_data.topics' 列表中筛选q&a条目并提取字段。
+    """
+    cdef list extracted_qas = []
+    cdef dict topic, question_data, answer_data
+
+    for topic in topics:
+        if topic.get('type') != 'q&a':
+            continue
+        question_data = topic.get('question')
+        if question_data is None:
+            continue
+        answer_data = topic.get('answer')
+        if answer_data is None:
+            continue
+
+        extracted_qas.append({
+            'topic_id': topic.get('topic_id'),
+            'create_time': topic.get('create_time'),
+            'questioner_name': _owner_name(question_data),
+            'question_text': question_data.get('text'),
+            'answerer_name': _owner_name(answer_data),
+            'answer_text': answer_data.get('text')
+        })
+
+    return extracted_qas
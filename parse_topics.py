@@ -1,13 +1,115 @@
-import json
+import os
+import sys
+import logging
 import argparse
+import itertools
 from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
 
-def parse_single_file(file_path):
+from qa_io import (
+    JSON_ERRORS, STREAM_THRESHOLD, SCALAR_EVENTS, ParseStats, QAWriter, bounded_map,
+    ijson, ijson_backend, iter_json_files, load_json_file, open_output, stream_tables,
+)
+
+logger = logging.getLogger(__name__)
+
+# 选择性流式解析用到的前缀表
+_TOPIC_PREFIX = 'resp_data.topics.item'
+_STREAM_FIELDS, _STREAM_MARKERS = stream_tables(_TOPIC_PREFIX)
+
+# 作为 .get() 默认值共享的空字典，避免每次调用都新建一个 (只读，切勿修改)
+_EMPTY = {}
+
+def _stream_file_qas(file_path):
+    """
+    使用 ijson 事件流逐个 topic 只提取需要的字段，评论、点赞、图片等
+    其余子树不会被构建成 Python 对象。
+    
+    返回值与 _extract_file_qas 相同。
+    """
+    extracted_qas = []
+    append = extracted_qas.append
+    fields = None
+    
+    with open(file_path, 'rb') as f:
+        for prefix, event, value in ijson_backend.parse(f, use_float=True):
+            if prefix == _TOPIC_PREFIX:
+                # 一个 topic 的开始/结束
+                if event == 'start_map':
+                    fields = {}
+                elif event == 'end_map' and fields is not None:
+                    if fields.get('type') == 'q&a' and 'question' in fields and 'answer' in fields:
+                        append({
+                            'topic_id': fields.get('topic_id'),
+                            'create_time': fields.get('create_time'),
+                            'questioner_name': fields.get('questioner_name'),
+                            'question_text': fields.get('question_text'),
+                            'answerer_name': fields.get('answerer_name'),
+                            'answer_text': fields.get('answer_text')
+                        })
+                    fields = None
+            elif fields is None:
+                continue
+            elif event in SCALAR_EVENTS:
+                key = _STREAM_FIELDS.get(prefix)
+                if key:
+                    fields[key] = value
+            elif event == 'start_map':
+                marker = _STREAM_MARKERS.get(prefix)
+                if marker:
+                    fields[marker] = True
+    
+    return extracted_qas
+
+def _extract_topics(topics):
+    """
+    从 'resp_data.topics' 列表中筛选q&a条目并提取字段。
+    
+    如果已编译 parse_fast.pyx (cythonize -3 -i parse_fast.pyx)，
+    会被其中等价的 Cython 实现替换。
+    """
+    
+    extracted_qas = []
+    append = extracted_qas.append
+    
+    for topic in topics:
+        # 只保留q&a类型且包含问题和答案的条目；
+        # 先比较 'type'，对占多数的非q&a条目只做一次字典查找
+        if topic.get('type') != 'q&a':
+            continue
+        question_data = topic.get('question')
+        if question_data is None:
+            continue
+        answer_data = topic.get('answer')
+        if answer_data is None:
+            continue
+        
+        # 提取字段 (owner 缺失或为 null 时统一回落到共享的空字典)
+        tg = topic.get
+        
+        # 将所有提取的数据添加到结果列表
+        append({
+            'topic_id': tg('topic_id'),
+            'create_time': tg('create_time'),
+            'questioner_name': (question_data.get('owner') or _EMPTY).get('name'),
+            'question_text': question_data.get('text'),
+            'answerer_name': (answer_data.get('owner') or _EMPTY).get('name'),
+            'answer_text': answer_data.get('text')
+        })
+    
+    return extracted_qas
+
+try:
+    from parse_fast import parse_topics as _extract_topics
+except ImportError:
+    pass
+
+def _extract_file_qas(file_path):
     """
     解析单个JSON文件并提取Q&A数据。
     
     参数:
-        file_path (Path): 指向单个json文件的Path对象。
+        file_path (str): 单个json文件的路径。
         
     返回:
         list: 包含该文件中所有Q&A字典的列表。
@@ -17,48 +119,43 @@ def parse_single_file(file_path):
         Exception: 其他文件读取或键错误。
     """
     
-    extracted_qas = []
+    # 超大文件只流式提取需要的字段
+    if ijson and os.path.getsize(file_path) >= STREAM_THRESHOLD:
+        return _stream_file_qas(file_path)
     
-    with open(file_path, 'r', encoding='utf-8') as f:
-        data = json.load(f)
+    data = load_json_file(file_path)
         
-    topics = data.get('resp_data', {}).get('topics', [])
+    topics = data.get('resp_data', _EMPTY).get('topics', [])
     
-    for topic in topics:
-        # 确保这是一个q&a类型的条目，并且包含问题和答案
-        if topic.get('type') == 'q&a' and 'question' in topic and 'answer' in topic:
-            try:
-                # 提取字段
-                topic_id = topic.get('topic_id')
-                create_time = topic.get('create_time')
-                
-                question_data = topic['question']
-                answer_data = topic['answer']
-                
-                questioner_name = question_data.get('owner', {}).get('name')
-                question_text = question_data.get('text')
-                answerer_name = answer_data.get('owner', {}).get('name')
-                answer_text = answer_data.get('text')
-                
-                # 将所有提取的数据添加到结果列表
-                extracted_qas.append({
-                    'topic_id': topic_id,
-                    'create_time': create_time,
-                    'questioner_name': questioner_name,
-                    'question_text': question_text,
-                    'answerer_name': answerer_name,
-                    'answer_text': answer_text
-                })
-            except KeyError as e:
-                # 即使在有效的q&a中，如果内部结构损坏，也打印警告
-                print(f"  [!] 警告: 跳过 {file_path.name} 中的一个条目，因为缺少键：{e}")
+    return _extract_topics(topics)
+
+def parse_single_file(file_path):
+    """
+    解析单个JSON文件，并捕获所有错误，便于在子进程中运行。
     
-    return extracted_qas
+    参数:
+        file_path (str): 单个json文件的路径。
+        
+    返回:
+        tuple: (文件名, Q&A字典列表或None, 错误信息或None)。
+    """
+    
+    file_name = os.path.basename(file_path)
+    try:
+        return file_name, _extract_file_qas(file_path), None
+    except JSON_ERRORS:
+        return file_name, None, f"无法解析 {file_name}。它不是一个有效的JSON文件。"
+    except PermissionError:
+        return file_name, None, f"没有读取 {file_name} 的权限。"
+    except Exception as e:
+        return file_name, None, f"处理 {file_name} 时发生意外错误: {e}"
 
-def process_directory(input_dir, output_file):
+def process_directory(input_dir, output_file, pretty=False):
     """
     遍历目录中的所有JSON文件，解析它们，并将所有Q&A聚合到
     一个输出文件中。
+    
+    默认输出紧凑的 JSON Lines；pretty=True 时输出带缩进的 JSON 数组。
     """
     
     input_path = Path(input_dir)
@@ -66,68 +163,83 @@ def process_directory(input_dir, output_file):
         print(f"错误: 输入路径 '{input_dir}' 不是一个有效的目录。")
         return
 
-    # 1. 查找所有 .json 文件
-    json_files = list(input_path.glob('*.json'))
+    # 1. 惰性查找 .json 文件；先取出第一个，用于判断目录中是否存在 .json 文件
+    json_files = iter_json_files(input_dir)
+    first_file = next(json_files, None)
     
-    if not json_files:
+    if first_file is None:
         print(f"在 '{input_dir}' 中没有找到 .json 文件。")
         return
+    json_files = itertools.chain([first_file], json_files)
+
+    # 2. 初始化摘要计数 (文件总数在处理过程中逐个累计)
+    stats = ParseStats()
+
+    print(f"开始处理 '{input_dir}' 中的 .json 文件...")
+
+    # 3. 打开输出文件，之后每解析完一个文件就把其中的 Q&A 逐条写入，
+    #    不再在内存中缓存全部结果
+    try:
+        out = open_output(output_file)
+    except Exception as e:
+        print(f"\n[!] 严重错误: 无法写入输出文件 {output_file}。错误: {e}")
+        return
+    writer = QAWriter(out, pretty)
+
+    # 4. 在进程池中并行解析所有文件，结果在主进程中依次汇总、写入和记录；
+    #    逐文件的处理详情只在 DEBUG 级别 (--verbose) 输出，失败信息始终输出
+    verbose = logger.isEnabledFor(logging.DEBUG)
+    write_error = None
+    with ProcessPoolExecutor(max_workers=os.cpu_count()) as executor:
+        for file_name, qas_from_file, error in bounded_map(executor, parse_single_file, json_files, chunksize=64):
+            stats.found += 1
+            if verbose:
+                logger.debug("\n--- 正在处理: %s ---", file_name)
+            if error:
+                logger.warning("  [!] 错误: %s", error)
+                stats.failed += 1
+                continue
 
-    # 2. 初始化聚合器和摘要计数器
-    all_extracted_qas = []
-    total_files_found = len(json_files)
-    files_processed_successfully = 0
-    files_failed = 0
-    total_qa_extracted = 0
-
-    print(f"在 '{input_dir}' 中找到了 {total_files_found} 个 .json 文件。开始处理...")
-
-    # 3. 遍历和解析每个文件
-    for file_path in json_files:
-        print(f"\n--- 正在处理: {file_path.name} ---")
-        try:
-            # 调用单个文件的解析函数
-            qas_from_file = parse_single_file(file_path)
-            
             if qas_from_file:
-                all_extracted_qas.extend(qas_from_file)
+                try:
+                    for qa in qas_from_file:
+                        writer.write(qa)
+                except OSError as e:
+                    # 写入中途失败时停止处理，但仍然打印已处理部分的摘要
+                    write_error = e
+                    break
                 num_extracted = len(qas_from_file)
-                total_qa_extracted += num_extracted
-                print(f"  [+] 成功: 提取了 {num_extracted} 条 Q&A。")
-            else:
-                print("  [i] 信息: 文件有效，但在 'topics' 中未找到 'q&a' 条目。")
-            
-            files_processed_successfully += 1
-            
-        except json.JSONDecodeError:
-            print(f"  [!] 错误: 无法解析 {file_path.name}。它不是一个有效的JSON文件。")
-            files_failed += 1
-        except PermissionError:
-            print(f"  [!] 错误: 没有读取 {file_path.name} 的权限。")
-            files_failed += 1
-        except Exception as e:
-            print(f"  [!] 错误: 处理 {file_path.name} 时发生意外错误: {e}")
-            files_failed += 1
-
-    # 4. 将所有聚合的数据写入输出文件
+                stats.qa += num_extracted
+                if verbose:
+                    logger.debug("  [+] 成功: 提取了 %d 条 Q&A。", num_extracted)
+            elif verbose:
+                logger.debug("  [i] 信息: 文件有效，但在 'topics' 中未找到 'q&a' 条目。")
+
+            stats.ok += 1
+
+    # 只把输出文件的写入/关闭失败 (例如磁盘已满) 报告为写入错误；
+    # 解析进程池本身的异常 (例如 BrokenProcessPool) 照常抛出
     try:
-        with open(output_file, 'w', encoding='utf-8') as f:
-            json.dump(all_extracted_qas, f, ensure_ascii=False, indent=4)
-        
-        print(f"\n--- 所有聚合数据已保存到: {output_file} ---")
+        with out:
+            if write_error is None:
+                writer.close()
+    except OSError as e:
+        write_error = write_error or e
 
-    except Exception as e:
-        print(f"\n[!] 严重错误: 无法写入输出文件 {output_file}。错误: {e}")
+    if write_error:
+        print(f"\n[!] 严重错误: 无法写入输出文件 {output_file}。错误: {write_error}")
+    else:
+        print(f"\n--- 所有聚合数据已保存到: {output_file} ---")
 
     # 5. 打印最终的解析摘要
     print("\n" + "="*30)
     print("      Parse Summary      ")
     print("="*30)
-    print(f"总共找到的 .json 文件: {total_files_found}")
-    print(f"成功处理的文件:         {files_processed_successfully}")
-    print(f"解析失败的文件:         {files_failed}")
+    print(f"总共找到的 .json 文件: {stats.found}")
+    print(f"成功处理的文件:         {stats.ok}")
+    print(f"解析失败的文件:         {stats.failed}")
     print("-" * 30)
-    print(f"提取的 Q&A 总数:      {total_qa_extracted}")
+    print(f"提取的 Q&A 总数:      {stats.qa}")
     print("="*30)
 
 if __name__ == "__main__":
@@ -136,8 +248,14 @@ if __name__ == "__main__":
     # 将参数从 'input_file' 改为 'input_dir'
     parser.add_argument("input_dir", help="包含Q&A数据的源目录路径。")
     
-    parser.add_argument("output_file", help="用于保存所有聚合结果的目标JSON文件路径。")
+    parser.add_argument("output_file", help="用于保存所有聚合结果的目标JSON Lines文件路径 (例如: all_qas_output.jsonl)；以 .zst 结尾时使用 zstd 压缩 (例如: all_qas_output.jsonl.zst)。")
+    
+    parser.add_argument("-v", "--verbose", action="store_true", help="输出每个文件的处理详情 (默认只输出失败信息和最终摘要)。")
+    
+    parser.add_argument("--pretty", action="store_true", help="输出带缩进的JSON数组而不是JSON Lines，便于人工查看 (较慢)。")
     
     args = parser.parse_args()
     
-    process_directory(args.input_dir, args.output_file)
\ No newline at end of file
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.INFO, format="%(message)s", stream=sys.stdout)
+    
+    process_directory(args.input_dir, args.output_file, pretty=args.pretty)
\ No newline at end of file
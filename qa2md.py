@@ -1,6 +1,44 @@
 import json
 import argparse
+import functools
 from datetime import datetime
+from operator import itemgetter
+
+try:
+    # ciso8601 是 C 实现的 ISO 8601 解析器，比 datetime.fromisoformat 更快
+    from ciso8601 import parse_datetime as _parse_datetime
+except ImportError:
+    _parse_datetime = datetime.fromisoformat
+
+from qa_io import JSON_ERRORS, orjson, ijson, ijson_backend, open_input
+
+# 每条 Q&A 记录必须包含的字段 (parse_single_qa.py / parse_topics.py 总会写出)
+_QA_KEYS = frozenset(('topic_id', 'create_time'))
+
+# 生成TOC预览时使用的转换表: 换行、回车、制表符一次性替换为空格
+_WS_TO_SPACE = str.maketrans({'\n': ' ', '\r': ' ', '\t': ' '})
+
+# 作者名中需要转义的 Markdown 特殊字符
+_MD_ESCAPE = str.maketrans({c: '\\' + c for c in '\\`*_[]'})
+
+# 单条 Q&A 正文的模板 (以换行开头，与前一片段隔开)，每条只做一次格式化
+_ITEM_TMPL = (
+    "\n\n---\n"
+    "\n<a id=\"%(anchor)s\"></a>"
+    "\n# %(index)d. %(time)s (ID: %(topic_id)s)"
+    "\n\n**提问：%(questioner)s**"
+    "\n> %(question)s"
+    "\n\n**回答：%(answerer)s**"
+    "\n\n%(answer)s\n"
+)
+
+@functools.lru_cache(maxsize=512)
+def _md_escape(text):
+    """
+    转义作者名中的 Markdown 特殊字符 (例如 "Valar Doha*" 会提前结束粗体)。
+    同一星球中的作者名高度重复，因此缓存转义结果。
+    """
+    return text.translate(_MD_ESCAPE)
 
 def get_sort_key(item):
     """
@@ -13,52 +51,55 @@ def get_sort_key(item):
         print(f"警告: 找到一个没有 'create_time' 的条目 (ID: {item.get('topic_id')})。")
         return datetime.min
     try:
-        # fromisoformat 可以直接解析 "2025-10-16T15:49:04.119+0800" 这种格式
-        return datetime.fromisoformat(time_str)
+        # ciso8601 和 fromisoformat 都可以直接解析 "2025-10-16T15:49:04.119+0800" 这种格式
+        return _parse_datetime(time_str)
     except ValueError:
         print(f"警告: 无法解析时间字符串 '{time_str}' (ID: {item.get('topic_id')})。")
         # 将格式错误的条目也放在最前面
         return datetime.min
 
-def generate_markdown_content(qa_list):
+def generate_markdown_content(qa_list, out_file):
     """
-    将Q&A列表转换为带有TOC和可跳转锚点的Markdown字符串。
+    将Q&A列表转换为带有TOC和可跳转锚点的Markdown，并直接写入 out_file。
+    
+    分两次遍历：第一次写入TOC，并记下每条的时间字符串；第二次把正文直接
+    写入 out_file。全程不会拼接出完整文档的大字符串，也不需要缓冲全部正文。
     """
     
-    # --- 1. 初始化TOC和内容列表 ---
-    toc_lines = ["# Q&A 合订本\n", "# 目录\n"]
-    content_lines = []
+    # --- 1. 写入标题 ---
+    out_file.write("# Q&A 合订本\n")
     
     if not qa_list:
-        toc_lines.append("未找到任何 Q&A 内容。")
-        return "".join(toc_lines)
+        out_file.write("# 目录\n未找到任何 Q&A 内容。")
+        return
+
+    out_file.write("\n# 目录\n")
+    write = out_file.write
+    time_strs = []
 
-    # --- 2. 遍历列表，同时生成TOC和内容 ---
+    # --- 2. 第一次遍历：生成TOC ---
     for index, qa in enumerate(qa_list, start=1):
+        g = qa.get
+        anchor = f"qa-{g('topic_id', 'unknown-id')}"
         
-        # --- 2a. 准备TOC条目 ---
-        
-        topic_id = qa.get('topic_id', 'unknown-id')
-        anchor = f"qa-{topic_id}"
-        
-        time_obj = get_sort_key(qa)
+        # 优先复用排序时缓存的解析结果，避免重复解析时间字符串
+        time_obj = g('_dt') or get_sort_key(qa)
         if time_obj == datetime.min:
             time_str_simple = "时间无效"
         else:
             time_str_simple = time_obj.strftime('%Y-%m-%d %H:%M')
+        time_strs.append(time_str_simple)
             
         # --- START: 新增逻辑 - 截取问题标题 ---
         # 1. 获取完整的 'question_text'
-        question_head = qa.get('question_text', '')
+        question_head = g('question_text', '')
         
         if not question_head:
             question_preview = "（无问题内容）"
         else:
-            # 2. 截取前15个字
-            question_preview = question_head[:20]
-            # 3. 'trim' - 移除换行符并去除首尾空格
-            question_preview = question_preview.replace('\n', ' ').strip()
-            # 4. 如果原文本更长，添加省略号
+            # 2. 截取前20个字，'trim' - 一次性将换行等空白替换为空格并去除首尾空格
+            question_preview = question_head[:20].translate(_WS_TO_SPACE).strip()
+            # 3. 如果原文本更长，添加省略号
             if len(question_head) > 20:
                 question_preview += "..."
         # --- END: 新增逻辑 ---
@@ -67,49 +108,73 @@ def generate_markdown_content(qa_list):
         toc_text = f"[{time_str_simple}] - {question_preview}"
         
         # 添加带序号的TOC条目
-        toc_lines.append(f"{index}. [{toc_text}](#{anchor})")
-        
-        
-        # --- 2b. 准备内容条目 ---
-        
-        content_lines.append("\n---\n")
-        content_lines.append(f'<a id="{anchor}"></a>')
-        
-        time_str_full = qa.get('create_time', 'N/A')
-        content_lines.append(f"# {index}. {time_str_simple} (ID: {topic_id})")
+        write(f"\n{index}. [{toc_text}](#{anchor})")
+    
+    # --- 3. 第二次遍历：生成内容 ---
+    for index, (qa, time_str_simple) in enumerate(zip(qa_list, time_strs), start=1):
+        g = qa.get
+        topic_id = g('topic_id', 'unknown-id')
         
         # 准备问题正文
-        questioner = qa.get('questioner_name', '匿名')
-        # (我们已经将全文保存在 'question_head' 变量中)
-        formatted_question = "> " + question_head.replace('\n', '\n> ')
-        
-        content_lines.append(f"\n**提问：{questioner}**")
-        content_lines.append(formatted_question)
+        questioner = g('questioner_name', '匿名')
+        formatted_question = g('question_text', '').replace('\n', '\n> ')
         
         # 准备回答正文
-        answerer = qa.get('answerer_name', '匿名')
-        answer_text = qa.get('answer_text', '（无回答内容）')
+        answerer = g('answerer_name', '匿名')
+        answer_text = g('answer_text', '（无回答内容）')
         
-        content_lines.append(f"\n**回答：{answerer}**")
-        content_lines.append(f"\n{answer_text}\n")
+        write(_ITEM_TMPL % {
+            'anchor': f"qa-{topic_id}",
+            'index': index,
+            'time': time_str_simple,
+            'topic_id': topic_id,
+            'questioner': _md_escape(str(questioner)),
+            'question': formatted_question,
+            'answerer': _md_escape(str(answerer)),
+            'answer': answer_text,
+        })
+
+def _first_non_blank_byte(f):
+    """
+    跳过文件开头的空白字符，返回 (但不消耗) 第一个非空白字节；文件为空时返回 b''。
     
-    # --- 3. 组合TOC和内容 ---
-    return "\n".join(toc_lines) + "\n" + "\n".join(content_lines)
+    参数:
+        f (io.BufferedReader): 以二进制方式打开、支持 peek() 的文件对象。
+    """
+    while True:
+        chunk = f.peek(1)
+        if not chunk:
+            return b''
+        stripped = chunk.lstrip()
+        if stripped:
+            # 丢弃已确认的前导空白，使下一次读取从该字节开始
+            f.read(len(chunk) - len(stripped))
+            return stripped[:1]
+        f.read(len(chunk))
 
 def create_markdown_compilation(input_file, output_file):
     """
-    读取JSON文件，排序，并生成Markdown合订本。
+    读取JSON数组 (或 JSON Lines，按内容自动识别，可选 .zst 压缩) 文件，排序，
+    并生成Markdown合订本。
     """
     
     print(f"正在从 {input_file} 读取数据...")
     
     try:
-        with open(input_file, 'r', encoding='utf-8') as f:
-            qa_list = json.load(f)
+        loads = orjson.loads if orjson else json.loads
+        with open_input(input_file) as f:
+            # 按内容而不是文件名判断格式: 以 '[' 开头的是 JSON 数组，否则按 JSON Lines 读取
+            if _first_non_blank_byte(f) != b'[':
+                # JSON Lines: 每行一条 Q&A
+                qa_list = [loads(line) for line in f if line.strip()]
+            elif ijson:
+                qa_list = list(ijson_backend.items(f, 'item', use_float=True))
+            else:
+                qa_list = loads(f.read())
     except FileNotFoundError:
         print(f"错误: 找不到输入文件 {input_file}")
         return
-    except json.JSONDecodeError:
+    except JSON_ERRORS:
         print(f"错误: 无法解析 {input_file}。请确保它是一个有效的JSON文件。")
         return
     except Exception as e:
@@ -120,20 +185,25 @@ def create_markdown_compilation(input_file, output_file):
         print("JSON文件为空或格式不正确（顶层不是一个列表）。")
         return
 
+    # JSON Lines 读取不会检查顶层结构，因此逐条确认都是 Q&A 对象，
+    # 避免把单行的原始接口响应等其他 JSON 当作 Q&A 处理
+    if not all(isinstance(qa, dict) and _QA_KEYS <= qa.keys() for qa in qa_list):
+        print("JSON文件为空或格式不正确（存在不是 Q&A 对象的条目）。")
+        return
+
     print(f"找到了 {len(qa_list)} 条 Q&A。正在按 'create_time' 排序...")
     
-    # 2. 按时间排序
-    qa_list.sort(key=get_sort_key)
+    # 2. 按时间排序 (每条只解析一次时间，并缓存到 '_dt' 供生成TOC时复用)
+    for qa in qa_list:
+        qa['_dt'] = get_sort_key(qa)
+    qa_list.sort(key=itemgetter('_dt'))
     
     print("排序完成。正在生成Markdown内容...")
     
-    # 3. 生成Markdown (现在包含TOC)
-    markdown_content = generate_markdown_content(qa_list)
-    
-    # 4. 写入文件
+    # 3. 生成Markdown (现在包含TOC) 并直接写入文件
     try:
         with open(output_file, 'w', encoding='utf-8') as f:
-            f.write(markdown_content)
+            generate_markdown_content(qa_list, f)
         print(f"\n成功！带有TOC的合订本已生成并保存到: {output_file}")
     except Exception as e:
         print(f"写入Markdown文件时发生错误: {e}")
@@ -142,7 +212,7 @@ def create_markdown_compilation(input_file, output_file):
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="将Q&A JSON文件转换为排序后的Markdown合订本。")
     
-    parser.add_argument("input_file", help="包含Q&A数据的源JSON文件路径 (例如: all_qas_output.json)。")
+    parser.add_argument("input_file", help="包含Q&A数据的源JSON或JSON Lines文件路径 (按内容自动识别)，支持 .zst 压缩 (例如: all_qas_output.json)。")
     
     parser.add_argument("output_file", help="要生成的目标Markdown文件路径 (例如: compilation.md)。")
     
@@ -0,0 +1,214 @@
+"""
+parse_single_qa.py、parse_topics.py 和 qa2md.py 共用的 I/O 辅助函数：
+可选依赖的导入、JSON 文件的读取与解析、聚合结果的写入以及解析摘要计数。
+"""
+
+import io
+import os
+import json
+import mmap
+from collections import deque
+from dataclasses import dataclass
+from itertools import islice
+
+try:
+    # orjson 直接在 bytes 上解析/序列化，比标准库 json 快得多
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    # ijson 用于超大文件的选择性流式解析，以及 JSON 数组的逐条读取
+    import ijson
+    try:
+        # 优先使用基于 C 的 yajl2_c 后端
+        ijson_backend = ijson.get_backend('yajl2_c')
+    except ImportError:
+        ijson_backend = ijson
+    JSON_ERRORS = (json.JSONDecodeError, ijson.JSONError)
+except ImportError:
+    ijson = None
+    ijson_backend = None
+    JSON_ERRORS = (json.JSONDecodeError,)
+
+try:
+    # zstandard 用于以 .zst 结尾的文件的流式压缩/解压
+    import zstandard as zstd
+except ImportError:
+    zstd = None
+
+# 超过该大小 (字节) 的输入文件使用 mmap 读取
+MMAP_THRESHOLD = 64 * 1024
+
+# 达到该大小 (字节) 的输入文件改用 ijson 选择性流式解析，只构建需要的字段；
+# 对普通大小的文件，orjson 整体解析仍然更快
+STREAM_THRESHOLD = 16 * 1024 * 1024
+
+# ijson 事件中带有标量值的事件类型
+SCALAR_EVENTS = frozenset(('string', 'number', 'boolean', 'null'))
+
+
+def stream_tables(topic_prefix):
+    """
+    生成选择性流式解析用到的前缀表。
+
+    参数:
+        topic_prefix (str): topic 对象在 JSON 中的前缀，例如 'resp_data.topic'。
+
+    返回:
+        tuple: (标量字段表 {JSON 前缀: 字段名},
+                只需判断是否存在 (且为对象) 的字段表 {JSON 前缀: 字段名})。
+    """
+    fields = {
+        topic_prefix + '.type': 'type',
+        topic_prefix + '.topic_id': 'topic_id',
+        topic_prefix + '.create_time': 'create_time',
+        topic_prefix + '.question.owner.name': 'questioner_name',
+        topic_prefix + '.question.text': 'question_text',
+        topic_prefix + '.answer.owner.name': 'answerer_name',
+        topic_prefix + '.answer.text': 'answer_text',
+    }
+    markers = {
+        topic_prefix + '.question': 'question',
+        topic_prefix + '.answer': 'answer',
+    }
+    return fields, markers
+
+
+@dataclass(slots=True)
+class ParseStats:
+    """
+    process_directory 的解析摘要计数。
+    """
+    found: int = 0      # 找到的 .json 文件
+    ok: int = 0         # 成功处理的文件
+    failed: int = 0     # 解析失败的文件
+    qa: int = 0         # 提取的 Q&A 总数
+
+
+def iter_json_files(input_dir):
+    """
+    使用 os.scandir 惰性地遍历目录，逐个产出其中 .json 文件的路径。
+
+    配合 bounded_map 使用时，目录扫描与解析交替进行，无需先扫描完整个目录。
+    """
+    with os.scandir(input_dir) as it:
+        for entry in it:
+            if entry.name.endswith('.json') and entry.is_file():
+                yield entry.path
+
+
+def _run_chunk(func, chunk):
+    """
+    在工作进程中依次对一个分块内的每一项调用 func。
+    """
+    return [func(item) for item in chunk]
+
+
+def bounded_map(executor, func, iterable, chunksize=64, max_pending=None):
+    """
+    与 executor.map(func, iterable, chunksize=chunksize) 相同，按输入顺序产出结果。
+
+    executor.map 会先遍历完整个 iterable 并一次性提交全部任务；这里最多只
+    保留 max_pending 个 (默认为 CPU 核数的 2 倍) 已提交但尚未取回的分块，
+    取回一个再补交一个，因此惰性的输入可以边读取边处理，内存占用也不随
+    输入数量增长。生成器提前关闭时，尚未开始的分块会被取消。
+    """
+    if max_pending is None:
+        max_pending = 2 * (os.cpu_count() or 1)
+    it = iter(iterable)
+    pending = deque()
+    try:
+        while True:
+            while len(pending) < max_pending:
+                chunk = list(islice(it, chunksize))
+                if not chunk:
+                    break
+                pending.append(executor.submit(_run_chunk, func, chunk))
+            if not pending:
+                return
+            yield from pending.popleft().result()
+    finally:
+        for future in pending:
+            future.cancel()
+
+
+def load_json_file(file_path):
+    """
+    读取并解析单个JSON文件。
+
+    使用 orjson 时，达到 MMAP_THRESHOLD 的文件通过 mmap 直接把磁盘页交给
+    解析器，省去先复制成 bytes 对象的一步；小文件 mmap 的系统调用开销反而
+    更大，仍然直接读取。
+    """
+    with open(file_path, 'rb') as f:
+        if orjson and os.fstat(f.fileno()).st_size >= MMAP_THRESHOLD:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm, memoryview(mm) as view:
+                return orjson.loads(view)
+        raw = f.read()
+    return orjson.loads(raw) if orjson else json.loads(raw)
+
+
+def dump_line(obj):
+    """
+    将一个对象序列化为 JSON Lines 格式的一行 (bytes)。
+    """
+    if orjson:
+        return orjson.dumps(obj) + b'\n'
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':')).encode('utf-8') + b'\n'
+
+
+class QAWriter:
+    """
+    将 Q&A 逐条写入已打开的二进制文件。
+
+    默认写入紧凑的 JSON Lines (无缩进、无多余空白)；pretty=True 时写入
+    带 4 空格缩进的 JSON 数组，便于人工查看，但序列化明显更慢。
+    """
+
+    def __init__(self, f, pretty=False):
+        self._f = f
+        self._pretty = pretty
+        self._count = 0
+        if pretty:
+            f.write(b'[')
+
+    def write(self, qa):
+        if self._pretty:
+            item = json.dumps(qa, ensure_ascii=False, indent=4).replace('\n', '\n    ')
+            self._f.write((b',\n    ' if self._count else b'\n    ') + item.encode('utf-8'))
+        else:
+            self._f.write(dump_line(qa))
+        self._count += 1
+
+    def close(self):
+        if self._pretty:
+            self._f.write(b'\n]' if self._count else b']')
+
+
+def open_output(output_file):
+    """
+    以二进制写入方式打开输出文件。
+
+    文件名以 .zst 结尾时，通过 zstd (level 3，多线程) 流式压缩后写入；
+    否则直接写入未压缩的文件。
+    """
+    if not str(output_file).endswith('.zst'):
+        return open(output_file, 'wb')
+    if zstd is None:
+        raise RuntimeError("写入 .zst 文件需要安装 zstandard (pip install zstandard)")
+    return zstd.ZstdCompressor(level=3, threads=-1).stream_writer(open(output_file, 'wb'))
+
+
+def open_input(input_file):
+    """
+    以二进制读取方式打开输入文件。
+
+    文件名以 .zst 结尾时，通过 zstd 流式解压后读取；否则直接读取未压缩的文件。
+    """
+    if not str(input_file).endswith('.zst'):
+        return open(input_file, 'rb')
+    if zstd is None:
+        raise RuntimeError("读取 .zst 文件需要安装 zstandard (pip install zstandard)")
+    # BufferedReader 为解压流提供 peek() 和按行迭代
+    return io.BufferedReader(zstd.ZstdDecompressor().stream_reader(open(input_file, 'rb')))